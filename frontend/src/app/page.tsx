@@ -1,6 +1,17 @@
 'use client';
 
 import { useState } from 'react';
+import { decodeMessagePack } from '@/lib/msgpack';
+
+interface StreamMessage {
+  type: 'eot' | 'status';
+  transcript?: string | null;
+  audio_size?: number;
+  vad_state?: {
+    speech_frames: number;
+    silence_frames: number;
+  };
+}
 
 interface LLMResponse {
   answer: string;
@@ -148,7 +159,10 @@ export default function Home() {
       // Connect to WebSocket
       const wsUrl = backendUrl.replace('http', 'ws') + '/ws/audio';
       const ws = new WebSocket(wsUrl);
-      
+      // The server sends MessagePack binary frames; ArrayBuffer lets us
+      // decode synchronously in onmessage instead of reading a Blob
+      ws.binaryType = 'arraybuffer';
+
       ws.onopen = () => {
         setStreamingStatus('Connected! Start speaking...');
         setIsRecording(true);
@@ -156,25 +170,25 @@ export default function Home() {
       };
       
       ws.onmessage = (event) => {
-        if (event.data instanceof Blob) {
-          // This is the complete audio buffer from EoT detection
-          setStreamingStatus('EoT detected! Audio buffer received.');
-          setEotDetected(true);
-          console.log('Received complete audio buffer:', event.data.size, 'bytes');
-        } else {
-          // This is a status message
-          try {
-            const message = JSON.parse(event.data);
-            if (message.type === 'eot') {
+        try {
+          // Status and EoT messages arrive as MessagePack binary frames
+          // (text frames are kept as a JSON fallback)
+          const message = (event.data instanceof ArrayBuffer
+            ? decodeMessagePack(event.data)
+            : JSON.parse(event.data)) as StreamMessage;
+          if (message.type === 'eot') {
+            if (message.transcript) {
+              setStreamingStatus(`EoT detected! Transcript: "${message.transcript}"`);
+            } else {
               setStreamingStatus(`EoT detected! Audio size: ${message.audio_size} bytes`);
-              setEotDetected(true);
-            } else if (message.type === 'status') {
-              const state = message.vad_state;
-              setStreamingStatus(`Listening... Speech: ${state.speech_frames}, Silence: ${state.silence_frames}`);
             }
-          } catch (e) {
-            console.log('Status update:', event.data);
+            setEotDetected(true);
+          } else if (message.type === 'status' && message.vad_state) {
+            const state = message.vad_state;
+            setStreamingStatus(`Listening... Speech: ${state.speech_frames}, Silence: ${state.silence_frames}`);
           }
+        } catch (e) {
+          console.log('Unrecognized message:', event.data);
         }
       };
       
@@ -0,0 +1,78 @@
+// Minimal MessagePack decoder for the status/EoT frames the audio WebSocket
+// sends. Vendored instead of pulling in @msgpack/msgpack so the frontend has
+// no new runtime dependency; covers every type Python's msgpack.packb emits
+// for JSON-like payloads (nil, bool, int, float, str, bin, array, map).
+export function decodeMessagePack(buffer: ArrayBuffer): unknown {
+  const view = new DataView(buffer);
+  const bytes = new Uint8Array(buffer);
+  const textDecoder = new TextDecoder();
+  let offset = 0;
+
+  const readString = (length: number): string => {
+    const value = textDecoder.decode(bytes.subarray(offset, offset + length));
+    offset += length;
+    return value;
+  };
+
+  const readBinary = (length: number): Uint8Array => {
+    const value = bytes.slice(offset, offset + length);
+    offset += length;
+    return value;
+  };
+
+  const readArray = (length: number): unknown[] => {
+    const items = new Array(length);
+    for (let i = 0; i < length; i++) {
+      items[i] = readValue();
+    }
+    return items;
+  };
+
+  const readMap = (length: number): Record<string, unknown> => {
+    const map: Record<string, unknown> = {};
+    for (let i = 0; i < length; i++) {
+      const key = readValue();
+      map[String(key)] = readValue();
+    }
+    return map;
+  };
+
+  const readValue = (): unknown => {
+    const byte = bytes[offset++];
+    if (byte <= 0x7f) return byte; // positive fixint
+    if (byte >= 0xe0) return byte - 0x100; // negative fixint
+    if (byte >= 0x80 && byte <= 0x8f) return readMap(byte & 0x0f); // fixmap
+    if (byte >= 0x90 && byte <= 0x9f) return readArray(byte & 0x0f); // fixarray
+    if (byte >= 0xa0 && byte <= 0xbf) return readString(byte & 0x1f); // fixstr
+
+    switch (byte) {
+      case 0xc0: return null;
+      case 0xc2: return false;
+      case 0xc3: return true;
+      case 0xc4: { const n = view.getUint8(offset); offset += 1; return readBinary(n); }
+      case 0xc5: { const n = view.getUint16(offset); offset += 2; return readBinary(n); }
+      case 0xc6: { const n = view.getUint32(offset); offset += 4; return readBinary(n); }
+      case 0xca: { const v = view.getFloat32(offset); offset += 4; return v; }
+      case 0xcb: { const v = view.getFloat64(offset); offset += 8; return v; }
+      case 0xcc: { const v = view.getUint8(offset); offset += 1; return v; }
+      case 0xcd: { const v = view.getUint16(offset); offset += 2; return v; }
+      case 0xce: { const v = view.getUint32(offset); offset += 4; return v; }
+      case 0xcf: { const v = view.getBigUint64(offset); offset += 8; return Number(v); }
+      case 0xd0: { const v = view.getInt8(offset); offset += 1; return v; }
+      case 0xd1: { const v = view.getInt16(offset); offset += 2; return v; }
+      case 0xd2: { const v = view.getInt32(offset); offset += 4; return v; }
+      case 0xd3: { const v = view.getBigInt64(offset); offset += 8; return Number(v); }
+      case 0xd9: { const n = view.getUint8(offset); offset += 1; return readString(n); }
+      case 0xda: { const n = view.getUint16(offset); offset += 2; return readString(n); }
+      case 0xdb: { const n = view.getUint32(offset); offset += 4; return readString(n); }
+      case 0xdc: { const n = view.getUint16(offset); offset += 2; return readArray(n); }
+      case 0xdd: { const n = view.getUint32(offset); offset += 4; return readArray(n); }
+      case 0xde: { const n = view.getUint16(offset); offset += 2; return readMap(n); }
+      case 0xdf: { const n = view.getUint32(offset); offset += 4; return readMap(n); }
+      default:
+        throw new Error(`Unsupported MessagePack type byte 0x${byte.toString(16)}`);
+    }
+  };
+
+  return readValue();
+}
@@ -1,11 +1,16 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
 import os
 from dotenv import load_dotenv
 import logging
 import asyncio
-import json
+
+import msgpack
+import orjson
 
 # Load environment variables
 load_dotenv()
@@ -14,10 +19,50 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Import service modules
+from services.llm_service import LLMService
+from services.vector_service import VectorService
+from services.audio_processing import RealTimeVADStreamer
+from services.asr_service import get_asr_service, transcribe_utterance_async
+
+# Initialize services; both default to the module-level embedder singleton,
+# so the LLM service's semantic answer cache doesn't load a second model
+vector_service = VectorService()
+llm_service = LLMService(vector_service=vector_service)
+
+# Minimum voiced frames (30ms each) an utterance needs before we spend a
+# Whisper decode on it; shorter bursts (coughs, keyboard noise) are dropped
+MIN_SPEECH_FRAMES = 5
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Load and warm the ASR model before accepting traffic."""
+    # Sanity check: every route path/method pair should be registered exactly
+    # once — duplicate module definitions would silently shadow handlers
+    seen_routes = set()
+    for route in app.routes:
+        key = (route.path, tuple(sorted(getattr(route, "methods", None) or [])))
+        if key in seen_routes:
+            logger.warning(f"Duplicate route registration detected: {route.path}")
+        seen_routes.add(key)
+
+    # Construct the Whisper model off the event loop, then run one dummy
+    # transcribe on a second of silence so the first real EoT doesn't pay
+    # the model-load + kernel-warmup cost on the real-time path
+    asr_service = await asyncio.to_thread(get_asr_service)
+    if asr_service.is_ready():
+        await asyncio.to_thread(asr_service.transcribe_utterance, b"\x00" * 32000)
+        logger.info("ASR model loaded and warmed up")
+    else:
+        logger.warning("ASR model failed to load during startup")
+    yield
+
 app = FastAPI(
     title="AI Interview System - Python Services",
     description="Microservices for LLM processing and Vector DB operations",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware
@@ -29,16 +74,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Import service modules
-from services.llm_service import LLMService
-from services.vector_service import VectorService
-from services.audio_processing import RealTimeVADStreamer
-from services.asr_service import transcribe_utterance
-
-# Initialize services
-llm_service = LLMService()
-vector_service = VectorService()
-
 # Request/Response models
 class QuestionRequest(BaseModel):
     question: str
@@ -49,6 +84,13 @@ class QuestionResponse(BaseModel):
     model_used: str
     processing_time: float
 
+class BatchQuestionRequest(BaseModel):
+    questions: list[str]
+    context: str = ""
+
+class BatchQuestionResponse(BaseModel):
+    answers: list[QuestionResponse]
+
 class VectorSearchResponse(BaseModel):
     results: list
     query: str
@@ -59,7 +101,7 @@ async def root():
     return {
         "service": "AI Interview System - Python Services",
         "status": "healthy",
-        "endpoints": ["/llm/answer", "/vector/search", "/vector/ingest"]
+        "endpoints": ["/llm/answer", "/llm/answer/batch", "/vector/search", "/vector/ingest"]
     }
 
 @app.get("/health")
@@ -89,6 +131,41 @@ async def answer_question(request: QuestionRequest):
         logger.error(f"LLM processing error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"LLM processing failed: {str(e)}")
 
+# Streaming LLM Q&A Endpoint
+@app.post("/llm/answer/stream")
+async def answer_question_stream(request: QuestionRequest):
+    try:
+        logger.info(f"Processing streaming LLM question: {request.question[:50]}...")
+
+        return StreamingResponse(
+            llm_service.answer_question_stream(
+                question=request.question,
+                context=request.context
+            ),
+            media_type="text/plain"
+        )
+
+    except Exception as e:
+        logger.error(f"LLM streaming error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"LLM streaming failed: {str(e)}")
+
+# Batched LLM Q&A Endpoint
+@app.post("/llm/answer/batch", response_model=BatchQuestionResponse)
+async def answer_questions_batch(request: BatchQuestionRequest):
+    try:
+        logger.info(f"Processing LLM batch of {len(request.questions)} questions")
+
+        results = await llm_service.answer_questions_batch(
+            questions=request.questions,
+            context=request.context
+        )
+
+        return BatchQuestionResponse(answers=[QuestionResponse(**result) for result in results])
+
+    except Exception as e:
+        logger.error(f"LLM batch processing error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"LLM batch processing failed: {str(e)}")
+
 # F.0.3: Vector Search Endpoint
 @app.get("/vector/search", response_model=VectorSearchResponse)
 async def search_vectors(query: str, limit: int = 5):
@@ -125,6 +202,17 @@ async def ingest_documents(documents: list[dict]):
         logger.error(f"Document ingestion error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Document ingestion failed: {str(e)}")
 
+# Strong references to fire-and-forget tasks: the event loop only keeps a
+# weak reference, so an otherwise-unreferenced task can be garbage-collected
+# before it runs
+_background_tasks: set = set()
+
+async def _log_step_functions_trigger(step_functions_input: dict):
+    """Log the simulated Step Functions payload off the EoT hot path."""
+    payload = await asyncio.to_thread(orjson.dumps, step_functions_input)
+    logger.info("Simulating AWS Step Functions workflow trigger with input:")
+    logger.info(payload.decode())
+
 # F.1.1: Streaming Audio WebSocket Endpoint
 @app.websocket("/ws/stream/audio")
 async def stream_audio(websocket: WebSocket):
@@ -142,7 +230,13 @@ async def stream_audio(websocket: WebSocket):
     
     # Initialize VAD streamer
     vad_streamer = RealTimeVADStreamer()
-    
+
+    # Status throttling: only send on speech-state transitions or as a
+    # periodic heartbeat, instead of one message per received chunk
+    status_heartbeat_s = 0.5
+    last_in_speech = vad_streamer.in_speech
+    last_status_time = 0.0
+
     try:
         while True:
             # Receive audio chunk from client
@@ -158,37 +252,46 @@ async def stream_audio(websocket: WebSocket):
             if complete_audio:
                 logger.info(f"EoT detected, processing complete audio buffer: {len(complete_audio)} bytes")
                 
-                # Transcribe the audio using ASR service
-                transcript = transcribe_utterance(complete_audio)
+                # Skip ASR entirely when the utterance had too few voiced
+                # frames - a full Whisper decode would just return ""
+                if vad_streamer.last_speech_frames < MIN_SPEECH_FRAMES:
+                    logger.info(f"Skipping ASR: only {vad_streamer.last_speech_frames} voiced frames")
+                    transcript = None
+                else:
+                    # Transcribe the audio via the ASR service's micro-batching
+                    # queue: the decode runs off the event loop, and concurrent
+                    # EoT events from other sessions share one batched dispatch
+                    transcript = await transcribe_utterance_async(complete_audio)
                 
                 if transcript:
                     logger.info(f"Final transcript: '{transcript}'")
-                    
+
+                    # Send EoT signal with transcript first, so the client
+                    # can start rendering before any logging happens
+                    eot_message = {
+                        "type": "eot",
+                        "transcript": transcript,
+                        "audio_size": len(complete_audio),
+                        "vad_state": vad_streamer.get_state(),
+                        "step_functions_triggered": True
+                    }
+
+                    await websocket.send_bytes(msgpack.packb(eot_message, use_bin_type=True))
+
                     # Simulate Step Functions workflow trigger (F.1.2)
                     step_functions_input = {
                         "utterance": transcript,
                         "session_id": "mock_session_123",  # In real implementation, this would come from session management
-                        "timestamp": asyncio.get_event_loop().time(),
+                        "timestamp": asyncio.get_running_loop().time(),
                         "audio_metadata": {
-                            "duration_ms": len(complete_audio) // 32,  # Rough estimate: 16kHz * 2 bytes = 32 bytes/ms
+                            "duration_ms": len(complete_audio) >> 5,  # 16kHz * 2 bytes = 32 bytes/ms
                             "size_bytes": len(complete_audio)
                         }
                     }
-                    
-                    logger.info("Simulating AWS Step Functions workflow trigger with input:")
-                    logger.info(json.dumps(step_functions_input, indent=2))
-                    
-                    # Send EoT signal with transcript
-                    eot_message = {
-                        "type": "eot",
-                        "transcript": transcript,
-                        "audio_size": len(complete_audio),
-                        "vad_state": vad_streamer.get_state(),
-                        "step_functions_triggered": True
-                    }
-                    
-                    await websocket.send_text(json.dumps(eot_message))
-                    
+                    task = asyncio.create_task(_log_step_functions_trigger(step_functions_input))
+                    _background_tasks.add(task)
+                    task.add_done_callback(_background_tasks.discard)
+
                 else:
                     logger.warning("Transcription failed, sending EoT without transcript")
                     eot_message = {
@@ -198,18 +301,24 @@ async def stream_audio(websocket: WebSocket):
                         "vad_state": vad_streamer.get_state(),
                         "step_functions_triggered": False
                     }
-                    await websocket.send_text(json.dumps(eot_message))
+                    await websocket.send_bytes(msgpack.packb(eot_message, use_bin_type=True))
                 
-                # Reset for next utterance
-                vad_streamer = RealTimeVADStreamer()
+                # Streamer state was already reset by process_chunk on EoT;
+                # keep the same instance (and its Vad object) for the next
+                # utterance instead of reconstructing it every turn
                 
-            # Send periodic status updates
+            # Send status updates only on state transitions (or heartbeat)
             elif len(data) > 0:  # Only send status for non-empty chunks
-                status_message = {
-                    "type": "status",
-                    "vad_state": vad_streamer.get_state()
-                }
-                await websocket.send_text(json.dumps(status_message))
+                now = asyncio.get_running_loop().time()
+                if (vad_streamer.in_speech != last_in_speech
+                        or now - last_status_time >= status_heartbeat_s):
+                    last_in_speech = vad_streamer.in_speech
+                    last_status_time = now
+                    status_message = {
+                        "type": "status",
+                        "vad_state": vad_streamer.get_state()
+                    }
+                    await websocket.send_bytes(msgpack.packb(status_message, use_bin_type=True))
                 
     except WebSocketDisconnect:
         logger.info("WebSocket audio stream connection closed")
@@ -222,4 +331,16 @@ async def stream_audio(websocket: WebSocket):
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
+    # uvloop + httptools replace the default selector loop and pure-Python
+    # h11 parser; WEB_CONCURRENCY scales across cores (each worker gets its
+    # own event loop — VAD/ASR state is per-connection, so this is safe).
+    # For production, prefer:
+    #   gunicorn main:app -k uvicorn.workers.UvicornWorker -w <2*cores+1> --bind 0.0.0.0:8001
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8001,
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("WEB_CONCURRENCY", "1"))
+    )
\ No newline at end of file
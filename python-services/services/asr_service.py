@@ -1,11 +1,36 @@
+import asyncio
 import logging
 import io
+import os
 import numpy as np
-from typing import Optional
+from typing import List, Optional
 from faster_whisper import WhisperModel
 
+try:
+    import ctranslate2
+except ImportError:
+    ctranslate2 = None
+
 logger = logging.getLogger(__name__)
 
+def _select_compute_type(device: str) -> str:
+    """
+    Pick the fastest int8 compute type the local CPU supports.
+
+    CTranslate2 exposes SIMD-aware variants (int8_bfloat16 on AVX-512 BF16,
+    int8_float16 on VNNI-class hardware); probe and take the best available,
+    falling back to plain int8.
+    """
+    if ctranslate2 is not None:
+        try:
+            supported = ctranslate2.get_supported_compute_types(device)
+            for candidate in ("int8_bfloat16", "int8_float16", "int8"):
+                if candidate in supported:
+                    return candidate
+        except Exception as e:
+            logger.warning(f"Could not probe supported compute types: {e}")
+    return "int8"
+
 class ASRService:
     """
     Automatic Speech Recognition (ASR) service using Faster-Whisper.
@@ -14,10 +39,19 @@ class ASRService:
     Optimized for cost control by running locally instead of using expensive API services.
     """
     
+    # Micro-batching: wait up to this long for more utterances to arrive
+    # before decoding, so concurrent sessions share one pass over the model
+    BATCH_WINDOW_S = 0.02
+    MAX_BATCH_SIZE = 8
+
+    # Scratch buffer sizing: 16kHz mono, up to 60s per utterance
+    SAMPLE_RATE = 16000
+    MAX_UTTERANCE_SECONDS = 60
+
     def __init__(self, model_size: str = "tiny.en", device: str = "cpu"):
         """
         Initialize the ASR service with a Whisper model.
-        
+
         Args:
             model_size: Whisper model size ("tiny.en", "base.en", "small.en", "medium.en", "large")
             device: Device to run on ("cpu", "cuda", "auto")
@@ -25,14 +59,50 @@ class ASRService:
         self.model_size = model_size
         self.device = device
         self.model = None
+        self._queue = None
+        self._batch_task = None
+        # Reusable float32 scratch buffer for int16 PCM conversion, so each
+        # utterance doesn't allocate (and walk) two fresh arrays
+        self._float_scratch = np.empty(
+            self.SAMPLE_RATE * self.MAX_UTTERANCE_SECONDS, dtype=np.float32
+        )
         self._initialize_model()
         
     def _initialize_model(self):
-        """Initialize the Whisper model lazily."""
-        # Don't initialize the model during __init__ to avoid blocking startup
-        # The model will be loaded on first use
-        self.model = None
-        logger.info(f"ASR service ready, model will be loaded on first use: {self.model_size}")
+        """Initialize the Whisper model eagerly."""
+        # Loading here (at service construction / FastAPI startup) keeps the
+        # cold-start cost off the first real-time utterance
+        logger.info(f"Loading Whisper model: {self.model_size} on {self.device}")
+
+        # Pin CTranslate2's CPU threading explicitly instead of letting it
+        # auto-detect: divide cores across uvicorn workers so concurrent
+        # decodes don't oversubscribe the machine. Set OMP_NUM_THREADS to the
+        # same value so OpenBLAS/OpenMP doesn't fight CTranslate2 for cores.
+        cpu_threads = int(os.getenv("ASR_CPU_THREADS", "0"))
+        if cpu_threads <= 0:
+            web_concurrency = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+            cpu_threads = max(1, (os.cpu_count() or 1) // web_concurrency)
+
+        # Best effort: OpenMP reads this at runtime initialization, which
+        # normally happens on the first parallel region — i.e. after this
+        # point. An explicit OMP_NUM_THREADS in the environment still wins
+        os.environ.setdefault("OMP_NUM_THREADS", str(cpu_threads))
+
+        compute_type = _select_compute_type(self.device)
+
+        try:
+            self.model = WhisperModel(
+                self.model_size,
+                device=self.device,
+                compute_type=compute_type,  # int8 quantized, SIMD-aware variant when supported
+                cpu_threads=cpu_threads,
+                num_workers=1
+            )
+            logger.info(f"Whisper model loaded successfully "
+                        f"(compute_type={compute_type}, cpu_threads={cpu_threads})")
+        except Exception as e:
+            logger.error(f"Failed to load Whisper model: {e}")
+            self.model = None
     
     def transcribe_utterance(self, audio_bytes: bytes) -> Optional[str]:
         """
@@ -45,37 +115,33 @@ class ASRService:
             Transcribed text string, or None if transcription fails
         """
         try:
-            # Load model on first use if not already loaded
             if not self.model:
-                logger.info(f"Loading Whisper model: {self.model_size} on {self.device}")
-                try:
-                    self.model = WhisperModel(
-                        self.model_size, 
-                        device=self.device,
-                        compute_type="int8"  # Use int8 for faster inference on CPU
-                    )
-                    logger.info("Whisper model loaded successfully")
-                except Exception as e:
-                    logger.error(f"Failed to load Whisper model: {e}")
-                    return None
-            
+                logger.error("Whisper model is not loaded, cannot transcribe")
+                return None
+
             if not audio_bytes:
                 logger.warning("Empty audio data provided")
                 return None
             
             logger.info(f"Transcribing audio: {len(audio_bytes)} bytes")
             
-            # Convert bytes to numpy array for Whisper
-            audio_array = np.frombuffer(audio_bytes, dtype=np.int16).astype(np.float32) / 32768.0
+            # Convert int16 PCM to float32 in one fused pass into the
+            # preallocated scratch buffer (no intermediate temp array)
+            n_samples = len(audio_bytes) // 2
+            if n_samples > self._float_scratch.shape[0]:
+                self._float_scratch = np.empty(n_samples, dtype=np.float32)
+            int16_view = np.frombuffer(audio_bytes, dtype=np.int16, count=n_samples)
+            audio_array = self._float_scratch[:n_samples]
+            np.multiply(int16_view, np.float32(1.0 / 32768.0), out=audio_array, casting="unsafe")
             
-            # Transcribe using Whisper
+            # Transcribe using Whisper. The streaming VAD has already gated
+            # speech upstream, so skip faster-whisper's internal Silero pass
             segments, info = self.model.transcribe(
                 audio_array,
                 beam_size=1,  # Faster inference
                 language="en",  # English only for .en models
                 task="transcribe",
-                vad_filter=True,  # Use VAD filtering for better results
-                vad_parameters=dict(min_silence_duration_ms=500)
+                vad_filter=False
             )
             
             # Extract text from segments
@@ -97,10 +163,68 @@ class ASRService:
             logger.error(f"Transcription failed: {e}")
             return None
     
+    async def transcribe_utterance_async(self, audio_bytes: bytes) -> Optional[str]:
+        """
+        Enqueue audio for micro-batched transcription and await the result.
+
+        Concurrent callers (e.g. multiple WebSocket sessions hitting EoT at
+        the same time) are grouped into a single batched decode instead of
+        each dispatching an independent model call.
+
+        Args:
+            audio_bytes: Raw audio bytes (16kHz, 16-bit, mono PCM)
+
+        Returns:
+            Transcribed text string, or None if transcription fails
+        """
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._batch_task = asyncio.create_task(self._batch_worker())
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((audio_bytes, future))
+        return await future
+
+    async def _batch_worker(self):
+        """Collect queued utterances into small batches and decode them."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+
+            # Wait a short window for more utterances to join the batch
+            deadline = loop.time() + self.BATCH_WINDOW_S
+            while len(batch) < self.MAX_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Decode shorter utterances first so similarly sized audio is
+            # processed together and quick turns aren't stuck behind long ones
+            batch.sort(key=lambda item: len(item[0]))
+
+            try:
+                transcripts = await asyncio.to_thread(
+                    self._transcribe_batch, [audio for audio, _ in batch]
+                )
+            except Exception as e:
+                logger.error(f"Batched transcription failed: {e}")
+                transcripts = [None] * len(batch)
+
+            for (_, future), transcript in zip(batch, transcripts):
+                if not future.done():
+                    future.set_result(transcript)
+
+    def _transcribe_batch(self, audio_batch: List[bytes]) -> List[Optional[str]]:
+        """Decode a batch of utterances in one worker-thread dispatch."""
+        return [self.transcribe_utterance(audio) for audio in audio_batch]
+
     def is_ready(self) -> bool:
         """Check if the ASR service is ready to process audio."""
-        # Service is always ready, model will be loaded on first use
-        return True
+        return self.model is not None
 
 # Global ASR service instance
 _asr_service = None
@@ -123,4 +247,18 @@ def transcribe_utterance(audio_bytes: bytes) -> Optional[str]:
         Transcribed text string, or None if transcription fails
     """
     asr_service = get_asr_service()
-    return asr_service.transcribe_utterance(audio_bytes)
\ No newline at end of file
+    return asr_service.transcribe_utterance(audio_bytes)
+
+async def transcribe_utterance_async(audio_bytes: bytes) -> Optional[str]:
+    """
+    Convenience function to transcribe audio bytes through the global ASR
+    service's micro-batching queue.
+
+    Args:
+        audio_bytes: Raw audio bytes (16kHz, 16-bit, mono PCM)
+
+    Returns:
+        Transcribed text string, or None if transcription fails
+    """
+    asr_service = get_asr_service()
+    return await asr_service.transcribe_utterance_async(audio_bytes)
\ No newline at end of file
@@ -1,9 +1,15 @@
 import asyncio
 import logging
+import os
 from typing import Optional, Tuple
 import webrtcvad
 import numpy as np
 
+try:
+    import onnxruntime
+except ImportError:
+    onnxruntime = None
+
 logger = logging.getLogger(__name__)
 
 class RealTimeVADStreamer:
@@ -14,36 +20,97 @@ class RealTimeVADStreamer:
     when a user has finished speaking (End-of-Turn) based on silence detection.
     """
     
-    def __init__(self, aggressiveness: int = 3, sample_rate: int = 16000, frame_duration: int = 30):
+    # Preallocated capture buffer: 120s of 16kHz 16-bit mono. Grown (rarely)
+    # if an utterance runs longer.
+    INITIAL_BUFFER_BYTES = 16000 * 2 * 120
+
+    # Preallocated float32 scratch rows for batched ONNX VAD inference
+    INITIAL_SCRATCH_FRAMES = 512
+
+    # Audio kept while the mic is idle, so speech onset isn't clipped when
+    # an utterance starts; everything older is discarded (an open-but-quiet
+    # connection would otherwise grow the buffer without bound)
+    PREROLL_SECONDS = 0.5
+
+    def __init__(self, aggressiveness: int = 3, sample_rate: int = 16000, frame_duration: int = 30,
+                 speech_threshold: float = 0.5):
         """
         Initialize the VAD streamer.
-        
+
         Args:
             aggressiveness: VAD aggressiveness level (0-3, 3 is most aggressive)
             sample_rate: Audio sample rate in Hz (16000 recommended)
             frame_duration: Frame duration in milliseconds (30ms recommended)
+            speech_threshold: Speech probability threshold for the ONNX VAD path
         """
         self.sample_rate = sample_rate
         self.frame_duration = frame_duration
         self.frame_size = int(sample_rate * frame_duration / 1000)  # samples per frame
-        
-        # Initialize VAD
+        self.frame_bytes_size = self.frame_size * 2  # 2 bytes per sample (16-bit)
+        self.speech_threshold = speech_threshold
+
+        # Initialize VAD: prefer an ONNX session when available, which
+        # classifies all complete frames in one batched call instead of one
+        # Python->C transition per 30ms frame. The model must be a stateless
+        # export taking a single (batch, frame_size) float32 "input" tensor;
+        # incompatible models are disabled on first failure at inference time
+        self._onnx_session = None
+        onnx_path = os.getenv('SILERO_VAD_ONNX_PATH')
+        if onnxruntime is not None and onnx_path and os.path.exists(onnx_path):
+            try:
+                self._onnx_session = onnxruntime.InferenceSession(
+                    onnx_path, providers=["CPUExecutionProvider"]
+                )
+                logger.info(f"Using Silero ONNX VAD: {onnx_path}")
+            except Exception as e:
+                logger.warning(f"Failed to load Silero ONNX VAD, falling back to webrtcvad: {e}")
         self.vad = webrtcvad.Vad(aggressiveness)
         
-        # Audio buffer for accumulating speech
-        self.audio_buffer = bytearray()
+        # Preallocated audio buffer for accumulating speech. `_head` marks the
+        # next byte to classify, `_tail` the next write position; consuming a
+        # frame just advances `_head` instead of reallocating/copying the tail
+        self._buffer = np.empty(self.INITIAL_BUFFER_BYTES, dtype=np.uint8)
+        self._head = 0
+        self._tail = 0
+
+        # Frame-aligned pre-roll retained during silence (see PREROLL_SECONDS)
+        self._preroll_bytes = (
+            int(self.PREROLL_SECONDS * sample_rate * 2) // self.frame_bytes_size
+        ) * self.frame_bytes_size
+
+        # Reusable float32 scratch for the int16 -> float32 frame conversion
+        # feeding ONNX VAD inference, so the 30ms cadence doesn't allocate a
+        # fresh array per chunk
+        self._frame_scratch = None
+        if self._onnx_session is not None:
+            self._frame_scratch = np.empty(
+                (self.INITIAL_SCRATCH_FRAMES, self.frame_size), dtype=np.float32
+            )
         
         # VAD state tracking
         self.silence_frames = 0
         self.speech_frames = 0
         self.in_speech = False
+        # Speech-frame count of the most recently completed utterance, kept
+        # across the post-EoT reset so callers can gate ASR on it
+        self.last_speech_frames = 0
         self.eot_silence_threshold = 1.5  # seconds of silence for EoT
         self.eot_frames_threshold = int(self.eot_silence_threshold * 1000 / frame_duration)
+
+        # Persistent state dict updated in place by get_state(); callers that
+        # need a snapshot should copy it with dict(state)
+        self._state = {
+            "buffer_size": 0,
+            "silence_frames": 0,
+            "speech_frames": 0,
+            "in_speech": False,
+            "eot_threshold": self.eot_frames_threshold
+        }
         
         logger.info(f"VAD Streamer initialized: {sample_rate}Hz, {frame_duration}ms frames, "
                    f"EoT threshold: {self.eot_silence_threshold}s ({self.eot_frames_threshold} frames)")
     
-    def process_chunk(self, chunk_data: bytes) -> Optional[bytes]:
+    def process_chunk(self, chunk_data: bytes) -> Optional[memoryview]:
         """
         Process an incoming audio chunk and detect End-of-Turn.
         
@@ -51,87 +118,173 @@ class RealTimeVADStreamer:
             chunk_data: Raw audio bytes (16kHz, 16-bit, mono PCM)
             
         Returns:
-            Complete audio buffer when EoT is detected, None otherwise
+            Complete audio buffer (zero-copy bytes-like view) when EoT is
+            detected, None otherwise
         """
         try:
-            # Add chunk to buffer
-            self.audio_buffer.extend(chunk_data)
-            
-            # Process complete frames
-            complete_frames = len(self.audio_buffer) // (self.frame_size * 2)  # 2 bytes per sample (16-bit)
-            
-            for i in range(complete_frames):
-                # Extract frame
-                start_idx = i * self.frame_size * 2
-                end_idx = start_idx + self.frame_size * 2
-                frame_bytes = bytes(self.audio_buffer[start_idx:end_idx])
-                
-                # Check if frame is valid for VAD (must be exactly the right size)
-                if len(frame_bytes) != self.frame_size * 2:
-                    continue
-                
-                # Classify frame as speech or silence
-                is_speech = self.vad.is_speech(frame_bytes, self.sample_rate)
-                
-                if is_speech:
-                    self.speech_frames += 1
-                    self.silence_frames = 0
-                    self.in_speech = True
-                    logger.debug(f"Speech detected (frame {self.speech_frames})")
-                else:
-                    self.silence_frames += 1
-                    logger.debug(f"Silence detected (frame {self.silence_frames})")
-                
-                # Check for End-of-Turn
-                if self.in_speech and self.silence_frames >= self.eot_frames_threshold:
+            # Append chunk to the preallocated buffer
+            n_bytes = len(chunk_data)
+            if self._tail + n_bytes > self._buffer.shape[0]:
+                self._grow(self._tail + n_bytes)
+            self._buffer[self._tail:self._tail + n_bytes] = np.frombuffer(chunk_data, dtype=np.uint8)
+            self._tail += n_bytes
+
+            # Process complete frames between head and tail
+            complete_frames = (self._tail - self._head) // self.frame_bytes_size
+
+            if complete_frames > 0:
+                # Classify all complete frames in one pass, then update the
+                # speech/silence counters with vectorized bookkeeping
+                speech_flags = self._classify_frames(complete_frames)
+
+                # Consuming frames is just an index bump — no tail copy
+                self._head += complete_frames * self.frame_bytes_size
+
+                if self._update_state(speech_flags):
                     logger.info(f"EoT detected: {self.silence_frames} silence frames after {self.speech_frames} speech frames")
-                    
-                    # Return complete audio buffer and reset
-                    complete_audio = bytes(self.audio_buffer)
-                    self._reset_state()
+
+                    # Transfer ownership of the filled buffer to the caller
+                    # (zero-copy memoryview) and start a fresh one, instead
+                    # of memcpy'ing the whole utterance out
+                    complete_audio = self._buffer[:self._tail].data
+                    self._buffer = np.empty(self.INITIAL_BUFFER_BYTES, dtype=np.uint8)
+                    self.reset()
                     return complete_audio
-            
-            # Remove processed frames from buffer
-            processed_bytes = complete_frames * self.frame_size * 2
-            self.audio_buffer = self.audio_buffer[processed_bytes:]
-            
+
+                # While no speech is in progress, discard consumed silence
+                # beyond the pre-roll window so a quiet open mic doesn't
+                # accumulate audio (or hand minutes of leading silence to
+                # Whisper once speech finally starts)
+                if not self.in_speech and self._head > self._preroll_bytes:
+                    start = self._head - self._preroll_bytes
+                    length = self._tail - start
+                    self._buffer[:length] = self._buffer[start:self._tail]
+                    self._head -= start
+                    self._tail = length
+
             return None
-            
+
         except Exception as e:
             logger.error(f"Error processing audio chunk: {e}")
             return None
+
+    def _grow(self, needed_bytes: int):
+        """Grow the capture buffer (rare; only for unusually long utterances)."""
+        new_size = max(needed_bytes, self._buffer.shape[0] * 2)
+        new_buffer = np.empty(new_size, dtype=np.uint8)
+        new_buffer[:self._tail] = self._buffer[:self._tail]
+        self._buffer = new_buffer
+        logger.warning(f"Audio buffer grown to {new_size} bytes")
+
+    def _classify_frames(self, complete_frames: int) -> np.ndarray:
+        """
+        Classify every complete frame in the buffer as speech or silence.
+
+        Returns a boolean array with one entry per frame. Uses a single
+        batched ONNX inference when a Silero session is loaded; otherwise
+        falls back to per-frame webrtcvad calls over a zero-copy memoryview.
+        """
+        frame_bytes_size = self.frame_bytes_size
+        region = self._buffer[self._head:self._head + complete_frames * frame_bytes_size]
+
+        if self._onnx_session is not None:
+            try:
+                samples = region.view(np.int16).reshape(complete_frames, self.frame_size)
+                if complete_frames > self._frame_scratch.shape[0]:
+                    self._frame_scratch = np.empty((complete_frames, self.frame_size), dtype=np.float32)
+                frames = self._frame_scratch[:complete_frames]
+                np.multiply(samples, np.float32(1.0 / 32768.0), out=frames, casting="unsafe")
+                probs = self._onnx_session.run(None, {"input": frames})[0].reshape(-1)
+                return probs > self.speech_threshold
+            except Exception as e:
+                # A model with a different signature (e.g. the stateful
+                # Silero export, which wants sr/state inputs and 512-sample
+                # windows) would fail identically on every chunk; disable
+                # the session once and classify with webrtcvad instead
+                logger.warning(f"ONNX VAD inference failed, falling back to webrtcvad: {e}")
+                self._onnx_session = None
+
+        speech_flags = np.empty(complete_frames, dtype=bool)
+        for i, offset in enumerate(range(0, complete_frames * frame_bytes_size, frame_bytes_size)):
+            frame_bytes = region[offset:offset + frame_bytes_size].tobytes()
+            speech_flags[i] = self.vad.is_speech(frame_bytes, self.sample_rate)
+        return speech_flags
+
+    def _update_state(self, speech_flags: np.ndarray) -> bool:
+        """
+        Update speech/silence counters from a batch of frame classifications.
+
+        Returns True when End-of-Turn is detected, i.e. when a run of silence
+        frames (possibly continuing from previous chunks) reaches the EoT
+        threshold after speech has been observed.
+        """
+        n_frames = speech_flags.shape[0]
+        speech_positions = np.flatnonzero(speech_flags)
+
+        if speech_positions.size == 0:
+            self.silence_frames += n_frames
+            return self.in_speech and self.silence_frames >= self.eot_frames_threshold
+
+        # Silence run carried in from previous chunks, ending at the first
+        # speech frame of this batch
+        eot = self.in_speech and \
+            (self.silence_frames + speech_positions[0]) >= self.eot_frames_threshold
+
+        # Silence runs between consecutive speech frames within this batch
+        if not eot and speech_positions.size > 1:
+            gaps = np.diff(speech_positions) - 1
+            eot = bool(gaps.max() >= self.eot_frames_threshold)
+
+        self.speech_frames += int(speech_positions.size)
+        self.in_speech = True
+
+        # Trailing silence run carries over to the next chunk
+        self.silence_frames = n_frames - 1 - int(speech_positions[-1])
+        return eot or self.silence_frames >= self.eot_frames_threshold
     
-    def _reset_state(self):
-        """Reset the VAD state for the next utterance."""
-        self.audio_buffer = bytearray()
+    def reset(self):
+        """Reset the VAD state for the next utterance.
+
+        The Vad object and capture buffer are kept alive, so reuse across
+        utterances avoids re-running the C-extension init per turn.
+        """
+        self.last_speech_frames = self.speech_frames
+        self._head = 0
+        self._tail = 0
         self.silence_frames = 0
         self.speech_frames = 0
         self.in_speech = False
         logger.debug("VAD state reset for next utterance")
     
     def get_state(self) -> dict:
-        """Get current VAD state for monitoring."""
-        return {
-            "buffer_size": len(self.audio_buffer),
-            "silence_frames": self.silence_frames,
-            "speech_frames": self.speech_frames,
-            "in_speech": self.in_speech,
-            "eot_threshold": self.eot_frames_threshold
-        }
+        """
+        Get current VAD state for monitoring.
+
+        Returns a persistent dict updated in place (no per-call allocation);
+        copy it with dict(...) if a stable snapshot is needed.
+        """
+        state = self._state
+        state["buffer_size"] = int(self._tail)
+        state["silence_frames"] = self.silence_frames
+        state["speech_frames"] = self.speech_frames
+        state["in_speech"] = self.in_speech
+        return state
     
-    def force_eot(self) -> Optional[bytes]:
+    def force_eot(self) -> Optional[memoryview]:
         """
         Force End-of-Turn detection, returning current buffer if speech was detected.
         
         Returns:
-            Complete audio buffer if speech was detected, None otherwise
+            Complete audio buffer (zero-copy bytes-like view) if speech was
+            detected, None otherwise
         """
-        if self.in_speech and len(self.audio_buffer) > 0:
+        if self.in_speech and self._tail > 0:
             logger.info("Forcing EoT detection")
-            complete_audio = bytes(self.audio_buffer)
-            self._reset_state()
+            complete_audio = self._buffer[:self._tail].data
+            self._buffer = np.empty(self.INITIAL_BUFFER_BYTES, dtype=np.uint8)
+            self.reset()
             return complete_audio
         else:
             logger.debug("No speech detected, nothing to return")
-            self._reset_state()
+            self.reset()
             return None
\ No newline at end of file
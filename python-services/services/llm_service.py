@@ -1,18 +1,62 @@
 import os
 import time
 import asyncio
-from typing import Dict, Any
+from typing import AsyncIterator, Dict, Any, List, Optional
 import logging
 
+import numpy as np
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
 logger = logging.getLogger(__name__)
 
 class LLMService:
-    def __init__(self):
+    # Semantic cache: questions whose embedding cosine-matches a cached one
+    # above this threshold reuse the cached answer instead of hitting the API
+    SEMANTIC_CACHE_THRESHOLD = 0.95
+    SEMANTIC_CACHE_MAX_ENTRIES = 1024
+    EMBEDDING_DIM = 384  # all-MiniLM-L6-v2
+
+    # Max in-flight completions for batch fan-out (respects API rate limits)
+    BATCH_CONCURRENCY = 50
+
+    # Single bit-identical system prompt, always sent as the first message.
+    # A stable prefix lets OpenAI's prompt caching discount repeated calls;
+    # rebuilding the string per request would defeat that
+    _SYSTEM_PROMPT = """You are an expert technical interviewer and software engineer.
+            Provide clear, concise, and technically accurate answers to programming and system design questions.
+            Focus on practical knowledge that would be relevant in a technical interview setting.
+            Keep responses under 200 words unless specifically asked for more detail."""
+
+    def __init__(self, embedder=None, vector_service=None):
         self.openai_api_key = os.getenv('OPENAI_API_KEY')
         self.google_api_key = os.getenv('GOOGLE_API_KEY')
         self.preferred_model = 'gpt-4o-mini'  # Cost-optimized as specified
         self._client = None
-        
+
+        # Shared sentence embedder for the semantic answer cache; defaults
+        # to the module-level singleton so no second model copy is loaded.
+        # Left as None (cache disabled) when no embedding backend is available
+        if embedder is None:
+            try:
+                from services.vector_service import get_embedder
+                embedder = get_embedder()
+            except Exception as e:
+                logger.warning(f"Embedder unavailable, semantic cache disabled: {e}")
+        self._embedder = embedder
+        # Optional VectorService for the LanceDB-backed persistent Q/A cache,
+        # which survives restarts unlike the in-memory layer
+        self._vector_service = vector_service
+        # Run cache embeddings on the vector service's bounded pool so all
+        # embedding concurrency is capped in one place; None falls back to
+        # the loop's default executor when no VectorService is wired up
+        self._embed_pool = vector_service._cpu_pool if vector_service is not None else None
+        self._qa_cache_embeddings = np.empty((0, self.EMBEDDING_DIM), dtype=np.float32)
+        self._qa_cache_answers = []
+
         # Initialize the preferred LLM client
         self._initialize_client()
     
@@ -25,7 +69,7 @@ class LLMService:
             
             if valid_openai_key:
                 import openai
-                self._client = openai.OpenAI(api_key=self.openai_api_key)
+                self._client = openai.AsyncOpenAI(api_key=self.openai_api_key)
                 self.active_provider = 'openai'
                 logger.info("Initialized OpenAI client")
             elif valid_google_key:
@@ -45,6 +89,37 @@ class LLMService:
     def is_ready(self) -> bool:
         """Check if the LLM service is ready to process requests"""
         return self._client is not None or self.active_provider == 'mock'
+
+    def _embed_question(self, question: str) -> Optional[np.ndarray]:
+        """Embed and L2-normalize a question for the semantic cache."""
+        if self._embedder is None:
+            return None
+        embedding = self._embedder.encode(question).astype(np.float32)
+        norm = np.linalg.norm(embedding)
+        if norm == 0:
+            return None
+        return embedding / norm
+
+    def _semantic_cache_lookup(self, question_embedding: np.ndarray) -> Optional[str]:
+        """Return a cached answer whose question is semantically close enough."""
+        if self._qa_cache_embeddings.shape[0] == 0:
+            return None
+        scores = self._qa_cache_embeddings @ question_embedding
+        best = int(np.argmax(scores))
+        if scores[best] >= self.SEMANTIC_CACHE_THRESHOLD:
+            logger.info(f"Semantic cache hit (similarity={scores[best]:.3f})")
+            return self._qa_cache_answers[best]
+        return None
+
+    def _semantic_cache_put(self, question_embedding: np.ndarray, answer: str):
+        """Store a fresh (question embedding, answer) pair with FIFO eviction."""
+        if self._qa_cache_embeddings.shape[0] >= self.SEMANTIC_CACHE_MAX_ENTRIES:
+            self._qa_cache_embeddings = self._qa_cache_embeddings[1:]
+            self._qa_cache_answers.pop(0)
+        self._qa_cache_embeddings = np.vstack(
+            [self._qa_cache_embeddings, question_embedding[np.newaxis, :]]
+        )
+        self._qa_cache_answers.append(answer)
     
     async def answer_question(self, question: str, context: str = "") -> Dict[str, Any]:
         """
@@ -58,14 +133,38 @@ class LLMService:
             Dict containing answer, model_used, and processing_time
         """
         start_time = time.time()
-        
+
         try:
-            # Construct the prompt for technical interview context
-            system_prompt = """You are an expert technical interviewer and software engineer. 
-            Provide clear, concise, and technically accurate answers to programming and system design questions.
-            Focus on practical knowledge that would be relevant in a technical interview setting.
-            Keep responses under 200 words unless specifically asked for more detail."""
-            
+            # Semantic cache: a question close enough to one already answered
+            # reuses the cached answer, skipping the API round-trip entirely
+            question_embedding = None
+            if self._embedder is not None and self.active_provider != 'mock':
+                loop = asyncio.get_running_loop()
+                question_embedding = await loop.run_in_executor(
+                    self._embed_pool, self._embed_question, question
+                )
+                if question_embedding is not None:
+                    cached_answer = self._semantic_cache_lookup(question_embedding)
+
+                    # Fall through to the persistent LanceDB cache, promoting
+                    # hits into the in-memory layer
+                    if cached_answer is None and self._vector_service is not None:
+                        cached_answer = await self._vector_service.qa_cache_lookup(
+                            question_embedding, threshold=self.SEMANTIC_CACHE_THRESHOLD
+                        )
+                        if cached_answer is not None:
+                            self._semantic_cache_put(question_embedding, cached_answer)
+
+                    if cached_answer is not None:
+                        return {
+                            "answer": cached_answer,
+                            "model_used": "cache",
+                            "processing_time": time.time() - start_time
+                        }
+
+            # Stable prompt prefix for technical interview context
+            system_prompt = self._SYSTEM_PROMPT
+
             if context:
                 full_prompt = f"Context: {context}\n\nQuestion: {question}"
             else:
@@ -79,8 +178,16 @@ class LLMService:
             else:
                 response = self._mock_completion(question)
             
+            # Remember the live answer for future near-duplicate questions
+            if question_embedding is not None:
+                self._semantic_cache_put(question_embedding, response)
+                if self._vector_service is not None:
+                    await self._vector_service.qa_cache_put(
+                        question_embedding, question, response
+                    )
+
             processing_time = time.time() - start_time
-            
+
             return {
                 "answer": response,
                 "model_used": self.preferred_model,
@@ -95,56 +202,176 @@ class LLMService:
                 "processing_time": time.time() - start_time
             }
     
+    async def answer_question_stream(self, question: str, context: str = "") -> AsyncIterator[str]:
+        """
+        Stream an answer as text deltas instead of one final string.
+
+        First tokens arrive in ~300ms instead of waiting the full 2-5s
+        generation, so callers can start rendering (or TTS) on partial text.
+        Cache hits and non-streaming providers yield their answer in one piece.
+
+        Args:
+            question: The question to answer
+            context: Optional context to help answer the question
+
+        Yields:
+            Incremental text fragments of the answer, in order
+        """
+        # Same semantic-cache front end as answer_question: a hit streams
+        # the cached answer immediately as a single fragment
+        question_embedding = None
+        if self._embedder is not None and self.active_provider != 'mock':
+            loop = asyncio.get_running_loop()
+            question_embedding = await loop.run_in_executor(
+                self._embed_pool, self._embed_question, question
+            )
+            if question_embedding is not None:
+                cached_answer = self._semantic_cache_lookup(question_embedding)
+                if cached_answer is None and self._vector_service is not None:
+                    cached_answer = await self._vector_service.qa_cache_lookup(
+                        question_embedding, threshold=self.SEMANTIC_CACHE_THRESHOLD
+                    )
+                    if cached_answer is not None:
+                        self._semantic_cache_put(question_embedding, cached_answer)
+                if cached_answer is not None:
+                    yield cached_answer
+                    return
+
+        system_prompt = self._SYSTEM_PROMPT
+
+        if context:
+            full_prompt = f"Context: {context}\n\nQuestion: {question}"
+        else:
+            full_prompt = question
+
+        if self.active_provider == 'openai':
+            parts = []
+            async for delta in self._openai_completion_stream(system_prompt, full_prompt):
+                parts.append(delta)
+                yield delta
+            response = "".join(parts)
+        elif self.active_provider == 'google':
+            # Gemini streaming isn't wired up; yield the full answer at once
+            response = await self._google_completion(system_prompt, full_prompt)
+            yield response
+        else:
+            response = self._mock_completion(question)
+            yield response
+
+        if question_embedding is not None and response:
+            self._semantic_cache_put(question_embedding, response)
+            if self._vector_service is not None:
+                await self._vector_service.qa_cache_put(
+                    question_embedding, question, response
+                )
+
+    async def answer_questions_batch(self, questions: List[str], context: str = "") -> List[Dict[str, Any]]:
+        """
+        Answer a batch of questions concurrently.
+
+        Fans the questions out with asyncio.gather under a semaphore so many
+        completions overlap network I/O without exceeding API rate limits.
+
+        Args:
+            questions: The questions to answer
+            context: Optional context applied to every question
+
+        Returns:
+            One answer_question result dict per question, in input order
+        """
+        semaphore = asyncio.Semaphore(self.BATCH_CONCURRENCY)
+
+        async def answer_one(question: str) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.answer_question(question, context)
+
+        results = await asyncio.gather(
+            *(answer_one(question) for question in questions),
+            return_exceptions=True
+        )
+
+        answers = []
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"Batch question failed: {result}")
+                answers.append({
+                    "answer": f"I apologize, but I encountered an error processing your question: {result}",
+                    "model_used": self.preferred_model,
+                    "processing_time": 0.0
+                })
+            else:
+                answers.append(result)
+        return answers
+
     async def _openai_completion(self, system_prompt: str, user_prompt: str) -> str:
-        """Get completion from OpenAI API"""
+        """Get completion from OpenAI API (streamed internally)."""
+        # Consume the streaming path so tokens flow as they are generated
+        # instead of waiting server-side for the full completion
+        parts = []
+        async for delta in self._openai_completion_stream(system_prompt, user_prompt):
+            parts.append(delta)
+        return "".join(parts)
+
+    async def _openai_completion_stream(self, system_prompt: str, user_prompt: str) -> AsyncIterator[str]:
+        """Stream completion deltas from the OpenAI API."""
         try:
-            # Run in thread pool to avoid blocking
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None,
-                lambda: self._client.chat.completions.create(
-                    model=self.preferred_model,
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt}
-                    ],
-                    max_tokens=300,
-                    temperature=0.7
-                )
+            stream = await self._client.chat.completions.create(
+                model=self.preferred_model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt}
+                ],
+                max_tokens=300,
+                temperature=0.7,
+                stream=True
             )
-            return response.choices[0].message.content
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    yield delta
         except Exception as e:
-            logger.error(f"OpenAI API error: {e}")
+            logger.error(f"OpenAI API streaming error: {e}")
             raise
-    
+
     async def _google_completion(self, system_prompt: str, user_prompt: str) -> str:
         """Get completion from Google Gemini API"""
         try:
             full_prompt = f"{system_prompt}\n\n{user_prompt}"
-            
-            # Run in thread pool to avoid blocking
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None,
-                lambda: self._client.generate_content(full_prompt)
-            )
+
+            # Gemini's SDK ships a native async entry point
+            response = await self._client.generate_content_async(full_prompt)
             return response.text
         except Exception as e:
             logger.error(f"Google Gemini API error: {e}")
             raise
     
+    _MOCK_RESPONSES = {
+        "rest api": "REST APIs are architectural style for web services using HTTP methods (GET, POST, PUT, DELETE) to perform CRUD operations. They are stateless, cacheable, and use standard HTTP status codes. Key principles include uniform interface, client-server architecture, and layered system design.",
+        "sharding": "Database sharding is a horizontal partitioning technique that splits large databases across multiple servers. Each shard contains a subset of data based on a sharding key. Benefits include improved performance and scalability, but challenges include increased complexity and potential for uneven data distribution.",
+        "microservices": "Microservices architecture breaks applications into small, independent services that communicate via APIs. Benefits include scalability, technology diversity, and fault isolation. Challenges include distributed system complexity, network latency, and data consistency across services."
+    }
+
+    # Aho-Corasick automaton over the mock keywords: one scan of the question
+    # finds any keyword in O(len(question)), independent of dictionary size
+    _MOCK_AUTOMATON = None
+    if ahocorasick is not None:
+        _MOCK_AUTOMATON = ahocorasick.Automaton()
+        for _key, _response in _MOCK_RESPONSES.items():
+            _MOCK_AUTOMATON.add_word(_key, _response)
+        _MOCK_AUTOMATON.make_automaton()
+        del _key, _response
+
     def _mock_completion(self, question: str) -> str:
         """Provide mock responses for testing when no API key is available"""
-        mock_responses = {
-            "rest api": "REST APIs are architectural style for web services using HTTP methods (GET, POST, PUT, DELETE) to perform CRUD operations. They are stateless, cacheable, and use standard HTTP status codes. Key principles include uniform interface, client-server architecture, and layered system design.",
-            "sharding": "Database sharding is a horizontal partitioning technique that splits large databases across multiple servers. Each shard contains a subset of data based on a sharding key. Benefits include improved performance and scalability, but challenges include increased complexity and potential for uneven data distribution.",
-            "microservices": "Microservices architecture breaks applications into small, independent services that communicate via APIs. Benefits include scalability, technology diversity, and fault isolation. Challenges include distributed system complexity, network latency, and data consistency across services."
-        }
-        
-        # Simple keyword matching for mock responses
         question_lower = question.lower()
-        for key, response in mock_responses.items():
-            if key in question_lower:
+
+        if self._MOCK_AUTOMATON is not None:
+            for _, response in self._MOCK_AUTOMATON.iter(question_lower):
                 return f"[MOCK RESPONSE] {response}"
-        
+        else:
+            # Fallback keyword matching when pyahocorasick isn't installed
+            for key, response in self._MOCK_RESPONSES.items():
+                if key in question_lower:
+                    return f"[MOCK RESPONSE] {response}"
+
         return f"[MOCK RESPONSE] Thank you for your question about '{question}'. In a real implementation, this would be processed by an LLM API. Please configure your API keys in the .env file to enable full functionality."
\ No newline at end of file
@@ -1,18 +1,133 @@
 import os
 import logging
-from typing import List, Dict, Any
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from typing import List, Dict, Any, Optional
 import asyncio
 import json
 
+import numpy as np
+
 logger = logging.getLogger(__name__)
 
+class _OnnxEmbedder:
+    """
+    SentenceTransformer-compatible encoder backed by ONNX Runtime.
+
+    Runs the exported all-MiniLM-L6-v2 graph through optimum's
+    ORTModelForFeatureExtraction with mean pooling, matching the torch
+    pipeline's output for the subset of encode() kwargs this service uses.
+    """
+
+    def __init__(self, model_name: str):
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        from transformers import AutoTokenizer
+
+        model_id = f"sentence-transformers/{model_name}"
+        self._model = ORTModelForFeatureExtraction.from_pretrained(
+            model_id, export=True, provider="CPUExecutionProvider"
+        )
+        self._tokenizer = AutoTokenizer.from_pretrained(model_id)
+
+    def encode(self, sentences, batch_size: int = 32, show_progress_bar: bool = False,
+               convert_to_numpy: bool = True, normalize_embeddings: bool = False):
+        """Encode one string or a list of strings to embeddings."""
+        single_input = isinstance(sentences, str)
+        texts = [sentences] if single_input else list(sentences)
+
+        pooled_batches = []
+        for start in range(0, len(texts), batch_size):
+            batch = texts[start:start + batch_size]
+            inputs = self._tokenizer(
+                batch, padding=True, truncation=True, max_length=128, return_tensors="np"
+            )
+            hidden = self._model(**inputs).last_hidden_state
+            hidden = np.asarray(hidden)
+
+            # Mean-pool over real (unmasked) tokens
+            mask = inputs["attention_mask"][:, :, np.newaxis].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            pooled_batches.append(pooled)
+
+        embeddings = np.concatenate(pooled_batches, axis=0).astype(np.float32)
+        if normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings /= np.maximum(norms, 1e-12)
+        return embeddings[0] if single_input else embeddings
+
+# Process-wide shared embedder: both VectorService and LLMService need
+# embeddings for short strings, and a second model copy would double memory
+# (~90 MB) and CPU cache pressure for identical weights
+_EMBEDDER = None
+
+def get_embedder(model_name: str = 'all-MiniLM-L6-v2'):
+    """
+    Return the shared sentence embedder, loading and warming it on first use.
+
+    Honors EMBEDDER_BACKEND=onnx (falling back to SentenceTransformer when
+    optimum isn't installed); every caller in the process gets the same
+    instance.
+    """
+    global _EMBEDDER
+    if _EMBEDDER is not None:
+        return _EMBEDDER
+
+    # Embedding backend: graph-fused ONNX Runtime kernels give a 2-4x CPU
+    # speedup over torch eager mode for this fixed architecture
+    if os.getenv('EMBEDDER_BACKEND', 'torch').lower() == 'onnx':
+        try:
+            _EMBEDDER = _OnnxEmbedder(model_name)
+            logger.info(f"Loaded ONNX embedding model: {model_name}")
+        except Exception as e:
+            logger.warning(f"ONNX embedder unavailable, falling back to torch: {e}")
+
+    if _EMBEDDER is None:
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        # Keep each embedder call single-threaded; parallelism comes from
+        # the caller's pool, not thread x BLAS oversubscription. Inference
+        # only, so skip autograd bookkeeping on every encode
+        torch.set_num_threads(1)
+        torch.set_grad_enabled(False)
+        _EMBEDDER = SentenceTransformer(model_name)
+        _EMBEDDER.eval()
+        logger.info(f"Loaded embedding model: {model_name}")
+
+    # Warm the model so the first real query doesn't pay the
+    # allocator/kernel-selection cost of a cold forward pass
+    _EMBEDDER.encode(["warmup"] * 4, batch_size=4, show_progress_bar=False)
+    logger.info("Embedding model warmed up")
+    return _EMBEDDER
+
 class VectorService:
-    def __init__(self):
+    # Table persisting the LLM prompt/response cache across restarts
+    QA_CACHE_TABLE = "qa_cache"
+
+    def __init__(self, embedder=None):
         self.db_path = os.getenv('VECTOR_DB_PATH', './data/lancedb')
         self.embedding_model = 'all-MiniLM-L6-v2'  # Lightweight embedding model
         self._db = None
-        self._embedder = None
-        
+        # Defaults to the module-level singleton (loaded in _initialize_db)
+        self._embedder = embedder
+        self._qa_cache_table = None
+
+        # Per-instance LRU cache over query embeddings: repeated queries hit
+        # a dict lookup instead of a transformer forward pass
+        self._embed_query_cached = lru_cache(maxsize=1024)(self._embed_query)
+
+        # Single-flight table: concurrent searches for the same (query, limit)
+        # await one shared future instead of each running encode + ANN query
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+
+        # Bounded pool for CPU-bound embedding work; the default executor's
+        # min(32, cores+4) threads oversubscribe the embedder under burst load
+        self._cpu_pool = ThreadPoolExecutor(
+            max_workers=max(2, (os.cpu_count() or 2) // 2),
+            thread_name_prefix="embed"
+        )
+
         # Initialize the vector database
         self._initialize_db()
     
@@ -20,19 +135,24 @@ class VectorService:
         """Initialize LanceDB and embedding model"""
         try:
             import lancedb
-            from sentence_transformers import SentenceTransformer
-            
+
             # Initialize LanceDB (embedded)
             self._db = lancedb.connect(self.db_path)
             logger.info(f"Connected to LanceDB at {self.db_path}")
-            
-            # Initialize embedding model
-            self._embedder = SentenceTransformer(self.embedding_model)
-            logger.info(f"Loaded embedding model: {self.embedding_model}")
-            
+
+            # Shared embedder singleton (loads and warms on first use)
+            if self._embedder is None:
+                self._embedder = get_embedder(self.embedding_model)
+
             # Create or connect to the documents table
             self._initialize_documents_table()
-            
+
+            # Reconnect to the persistent Q/A cache if one exists (the table
+            # itself is created lazily on the first qa_cache_put)
+            if self.QA_CACHE_TABLE in self._db.table_names():
+                self._qa_cache_table = self._db.open_table(self.QA_CACHE_TABLE)
+                logger.info(f"Connected to existing table '{self.QA_CACHE_TABLE}'")
+
         except Exception as e:
             logger.error(f"Failed to initialize vector database: {e}")
             self._db = None
@@ -86,23 +206,27 @@ class VectorService:
                     }
                 ]
                 
-                # Generate embeddings for documents
-                documents_with_embeddings = []
-                for doc in mock_documents:
-                    # Combine title and content for embedding
-                    text_to_embed = f"{doc['title']} {doc['content']}"
-                    embedding = self._embedder.encode(text_to_embed).tolist()
-                    
-                    doc_with_embedding = {
-                        **doc,
-                        "embedding": embedding,
-                        "text": text_to_embed
-                    }
-                    documents_with_embeddings.append(doc_with_embedding)
+                # Generate embeddings for all documents in one batched
+                # forward pass (title + content combined per document)
+                texts = [f"{doc['title']} {doc['content']}" for doc in mock_documents]
+                embeddings = self._embedder.encode(
+                    texts, batch_size=32, show_progress_bar=False,
+                    convert_to_numpy=True, normalize_embeddings=True
+                )
+                # Store as float16: half the bytes per vector, so scans move
+                # half the memory (Python-list floats would be stored as f64)
+                documents_with_embeddings = [
+                    {**doc, "embedding": embedding.astype(np.float16), "text": text}
+                    for doc, embedding, text in zip(mock_documents, embeddings, texts)
+                ]
                 
                 # Create table with documents
                 self._table = self._db.create_table(table_name, documents_with_embeddings)
                 logger.info(f"Created table '{table_name}' with {len(documents_with_embeddings)} documents")
+
+                # Index the vectors so search traverses partitions instead of
+                # brute-scanning every row
+                self._create_vector_index()
             else:
                 # Connect to existing table
                 self._table = self._db.open_table(table_name)
@@ -112,6 +236,88 @@ class VectorService:
             logger.error(f"Failed to initialize documents table: {e}")
             self._table = None
     
+    def _create_vector_index(self):
+        """
+        Build an ANN (IVF_PQ) index over the embedding column.
+
+        LanceDB's default is a flat scan - fine for the mock corpus, O(N*d)
+        for a realistic one. Index training needs enough rows, so failures
+        (e.g. on tiny tables) just fall back to the flat scan.
+        """
+        try:
+            self._table.create_index(
+                metric="cosine",
+                vector_column_name="embedding",
+                index_type="IVF_PQ",
+                num_partitions=256,
+                num_sub_vectors=16
+            )
+            logger.info("Created IVF_PQ vector index on embedding column")
+        except Exception as e:
+            logger.warning(f"ANN index creation skipped, using flat scan: {e}")
+
+    def _qa_cache_search(self, query_vector: np.ndarray) -> List[Dict[str, Any]]:
+        """Run the nearest-neighbor QA cache query (blocking; executor-only)."""
+        return self._qa_cache_table.search(query_vector).metric("cosine").limit(1).to_list()
+
+    async def qa_cache_lookup(self, question_embedding, threshold: float = 0.95) -> Optional[str]:
+        """
+        Look up a persistently cached answer for a semantically close question.
+
+        Args:
+            question_embedding: L2-normalized embedding of the question
+            threshold: Minimum cosine similarity to accept a cached answer
+
+        Returns:
+            The cached answer string, or None on a miss
+        """
+        if self._qa_cache_table is None:
+            return None
+
+        try:
+            query_vector = np.asarray(question_embedding, dtype=np.float16)
+            loop = asyncio.get_running_loop()
+            results = await loop.run_in_executor(
+                self._cpu_pool, self._qa_cache_search, query_vector
+            )
+            if results:
+                similarity = 1.0 - float(results[0].get("_distance", 1.0))
+                if similarity >= threshold:
+                    logger.info("Persistent QA cache hit (similarity=%.3f)", similarity)
+                    return results[0]["answer"]
+        except Exception as e:
+            logger.error("QA cache lookup error: %s", e)
+        return None
+
+    async def qa_cache_put(self, question_embedding, question: str, answer: str):
+        """Persist a (question embedding, answer) pair for future lookups."""
+        if self._db is None:
+            return
+
+        row = {
+            "embedding": np.asarray(question_embedding, dtype=np.float16),
+            "question": question,
+            "answer": answer,
+            "ts": time.time()
+        }
+
+        def _put():
+            if self._qa_cache_table is None:
+                self._qa_cache_table = self._db.create_table(self.QA_CACHE_TABLE, [row])
+                logger.info(f"Created table '{self.QA_CACHE_TABLE}'")
+            else:
+                self._qa_cache_table.add([row])
+
+        try:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self._cpu_pool, _put)
+        except Exception as e:
+            logger.error("QA cache put error: %s", e)
+
+    def _embed_query(self, query: str) -> tuple:
+        """Embed a query string (L2-normalized), as a hashable tuple for LRU caching."""
+        return tuple(self._embedder.encode(query, normalize_embeddings=True).tolist())
+
     def is_ready(self) -> bool:
         """Check if the vector service is ready"""
         return self._db is not None and self._embedder is not None and self._table is not None
@@ -119,29 +325,68 @@ class VectorService:
     async def search(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
         """
         Perform vector similarity search
-        
+
+        Duplicate in-flight queries coalesce onto one embed + ANN search
+        (single-flight); all waiters receive the same result list.
+
         Args:
             query: Search query string
             limit: Maximum number of results to return
-            
+
         Returns:
             List of matching documents with similarity scores
         """
         if not self.is_ready():
             logger.error("Vector service not ready")
             return []
-        
+
+        key = (query, limit)
+        existing = self._inflight.get(key)
+        if existing is not None:
+            return await existing
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
         try:
-            # Generate embedding for the query
-            loop = asyncio.get_event_loop()
-            query_embedding = await loop.run_in_executor(
-                None, 
-                lambda: self._embedder.encode(query).tolist()
-            )
-            
-            # Perform vector search
-            results = self._table.search(query_embedding).limit(limit).to_list()
+            results = await self._do_search(query, limit)
+            future.set_result(results)
+            return results
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            # Covers exits that bypass the except clause (CancelledError on
+            # client disconnect/shutdown): cancel the shared future so
+            # coalesced waiters fail fast instead of hanging forever
+            if not future.done():
+                future.cancel()
+            self._inflight.pop(key, None)
+
+    async def _do_search(self, query: str, limit: int) -> List[Dict[str, Any]]:
+        """Embed the query and run the vector search (no coalescing)."""
+        try:
+            # Generate embedding for the query (LRU-cached on normalized text,
+            # so repeated queries skip the forward pass entirely)
+            loop = asyncio.get_running_loop()
+            query_embedding = np.asarray(await loop.run_in_executor(
+                self._cpu_pool,
+                self._embed_query_cached,
+                query.strip().lower()
+            ), dtype=np.float16)  # match the stored vector dtype
             
+            # Perform vector search (cosine over write-time-normalized vectors).
+            # Project away the embedding column and fetch Arrow: to_list()
+            # would materialize ~384 Python floats of vector per row that the
+            # response never uses
+            results = (
+                self._table.search(query_embedding)
+                .metric("cosine")
+                .select(["id", "title", "content", "category", "tags"])
+                .limit(limit)
+                .to_arrow()
+                .to_pylist()
+            )
+
             # Format results
             formatted_results = []
             for result in results:
@@ -151,15 +396,15 @@ class VectorService:
                     "content": result.get("content"),
                     "category": result.get("category"),
                     "tags": result.get("tags", []),
-                    "similarity_score": float(result.get("_distance", 0))  # LanceDB returns distance
+                    "similarity_score": 1.0 - float(result.get("_distance", 1.0))  # cosine distance -> similarity
                 }
                 formatted_results.append(formatted_result)
             
-            logger.info(f"Vector search for '{query}' returned {len(formatted_results)} results")
+            logger.info("Vector search for %r returned %d results", query, len(formatted_results))
             return formatted_results
             
         except Exception as e:
-            logger.error(f"Vector search error: {e}")
+            logger.error("Vector search error: %s", e)
             return []
     
     async def ingest_documents(self, documents: List[Dict[str, Any]]) -> Dict[str, Any]:
@@ -176,32 +421,33 @@ class VectorService:
             raise Exception("Vector service not ready")
         
         try:
-            documents_with_embeddings = []
-            
-            for doc in documents:
-                # Generate text for embedding
-                text_to_embed = f"{doc.get('title', '')} {doc.get('content', '')}"
-                
-                # Generate embedding
-                loop = asyncio.get_event_loop()
-                embedding = await loop.run_in_executor(
-                    None,
-                    lambda: self._embedder.encode(text_to_embed).tolist()
+            # Embed all documents in one batched forward pass through a
+            # single executor dispatch, instead of one encode per document
+            texts = [f"{doc.get('title', '')} {doc.get('content', '')}" for doc in documents]
+
+            loop = asyncio.get_running_loop()
+            # partial binds texts and kwargs at construction, so there is no
+            # late-binding closure and no per-call lambda object
+            embeddings = await loop.run_in_executor(
+                self._cpu_pool,
+                partial(
+                    self._embedder.encode, texts,
+                    batch_size=32, show_progress_bar=False,
+                    convert_to_numpy=True, normalize_embeddings=True
                 )
-                
-                doc_with_embedding = {
-                    **doc,
-                    "embedding": embedding,
-                    "text": text_to_embed
-                }
-                documents_with_embeddings.append(doc_with_embedding)
-            
+            )
+
+            documents_with_embeddings = [
+                {**doc, "embedding": embedding.astype(np.float16), "text": text}
+                for doc, embedding, text in zip(documents, embeddings, texts)
+            ]
+
             # Add documents to table
             self._table.add(documents_with_embeddings)
             
-            logger.info(f"Successfully ingested {len(documents)} documents")
+            logger.info("Successfully ingested %d documents", len(documents))
             return {"count": len(documents), "status": "success"}
             
         except Exception as e:
-            logger.error(f"Document ingestion error: {e}")
+            logger.error("Document ingestion error: %s", e)
             raise
\ No newline at end of file